@@ -1,86 +1,259 @@
 from lib import *
 
 
+# Use orjson for (de)serialization when available, otherwise fall back to json
+if orjson:
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+else:
+    _json_loads = json.loads
+
+    def _json_dumps(data) -> bytes:
+        return json.dumps(data).encode()
+
+
+# Seconds to wait for further changes before writing a user's data to disk
+SAVE_DELAY = 0.2
+
+# Serialized data at least this many bytes long is compressed before encryption
+COMPRESS_MIN_SIZE = 1024
+
+# Leading byte that marks compressed data, plain JSON always starts with "{"
+_COMPRESSED_TAG = b"\x01"
+
+
 class UserDataHandler:
     """Class to handle user data, including encryption and decryption"""
 
     def __init__(self):
         self.encryption_key = os.getenv("ENCRYPTION_KEY")
+        self._cipher = cryptography.fernet.Fernet(self.encryption_key)
         self.data_folder = pathlib.Path("user_data")
         self.data_folder.mkdir(parents=True, exist_ok=True)
+        self._cache = {}  # Decrypted user data, keyed by user ID
+        self._mtimes = {}  # File modification time of the cached data, keyed by user ID
+        self._dirty = {}  # User data waiting to be written, keyed by user ID
+        self._flush_task = None  # Task that writes all pending user data
+        self._last_hash = {}  # Hash of the last loaded or saved data, keyed by user ID
+        self._loading = {}  # File reads in progress, keyed by user ID
+        self._pending_writes = {}  # Serialized data to be written, keyed by user ID
+        self._write_lock = threading.Lock()  # Keeps writes from threads in order
 
-    def _get_user_file_path(self, user_id: str):
+    def _get_user_file_path(self, user_id: int):
         """Method to get the path to a user's data file"""
         return self.data_folder / f"user_{user_id}.json"
 
-    def _load_user_data(self, user_id: str):
-        """Method to load a user's data from a file"""
+    def _get_mtime(self, user_file: pathlib.Path):
+        """Method to get a file's modification time, or None if it doesn't exist"""
+        try:
+            return user_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _get_cached_user_data(self, user_id: int, user_file: pathlib.Path):
+        """Method to get a user's cached data, or None if the file changed since"""
+        if user_id not in self._cache:
+            return None
+        # Pending changes are newer than the file, otherwise check it wasn't edited
+        if self._flush_task is not None or (
+            self._get_mtime(user_file) == self._mtimes.get(user_id)
+        ):
+            return self._cache[user_id]
+        return None
+
+    def _read_user_data(self, user_file: pathlib.Path):
+        """Method to read and decrypt a user's data file, returning its mtime, data and hash"""
+        mtime = self._get_mtime(user_file)
+        encrypted_data = user_file.read_bytes() if mtime is not None else b""
+        if not encrypted_data:
+            return mtime, {}, None
+
+        decrypted_data = self._cipher.decrypt(encrypted_data)
+        if decrypted_data.startswith(_COMPRESSED_TAG):
+            decrypted_data = zlib.decompress(decrypted_data[1:])
+        user_data = _json_loads(decrypted_data)
+        self._upgrade_user_data(user_data)
+        return mtime, user_data, self._hash(decrypted_data)
+
+    async def _load_user_data(self, user_id: int):
+        """Method to load a user's data, reading the file in a worker thread if needed"""
         user_file = self._get_user_file_path(user_id)
-        cipher_suite = cryptography.fernet.Fernet(self.encryption_key)
-        if not user_file.is_file() or user_file.stat().st_size == 0:
-            return {}
-        with user_file.open("rb") as file:
-            encrypted_data = file.read()
-        decrypted_data = cipher_suite.decrypt(encrypted_data)
-        return json.loads(decrypted_data)
-
-    def _save_user_data(self, user_id: str, data: list):
-        """Method to save a user's data to a file"""
+        user_data = self._get_cached_user_data(user_id, user_file)
+        if user_data is not None:
+            return user_data
+
+        # Share one file read between commands loading the same user at once
+        read_task = self._loading.get(user_id)
+        if read_task is None:
+            read_task = asyncio.ensure_future(
+                asyncio.to_thread(self._read_user_data, user_file)
+            )
+            read_task.add_done_callback(lambda _: self._loading.pop(user_id, None))
+            self._loading[user_id] = read_task
+
+        mtime, user_data, data_hash = await asyncio.shield(read_task)
+
+        # Another command may have loaded the data while the file was being read
+        cached_data = self._get_cached_user_data(user_id, user_file)
+        if cached_data is not None:
+            return cached_data
+
+        self._cache[user_id] = user_data
+        self._mtimes[user_id] = mtime
+        if data_hash:
+            self._last_hash[user_id] = data_hash
+        else:
+            # The file is gone or empty, so the next save must not be skipped
+            self._last_hash.pop(user_id, None)
+        return user_data
+
+    def _upgrade_user_data(self, user_data: dict):
+        """Method to convert a list of events into a dict keyed by ID, sorted by timestamp"""
+        events = user_data.get("events")
+        if not isinstance(events, list):
+            return
+
+        events.sort(key=lambda event: event["timestamp"])
+        next_id = max((event["id"] for event in events), default=-1) + 1
+        user_data["events"] = {}
+        for event in events:
+            # Older versions could assign the same ID twice, give duplicates a new one
+            if str(event["id"]) in user_data["events"]:
+                event["id"] = next_id
+                next_id += 1
+            user_data["events"][str(event["id"])] = event
+        user_data["next_id"] = next_id
+
+    @staticmethod
+    def _hash(payload: bytes) -> bytes:
+        """Method to get a short digest of serialized user data"""
+        return hashlib.blake2b(payload, digest_size=16).digest()
+
+    def _write_user_data(self, user_id: int, payload: bytes):
+        """Method to encrypt serialized user data and write it to a file"""
+        # Skip encrypting and writing data that hasn't changed since it was last stored
+        payload_hash = self._hash(payload)
+        if self._last_hash.get(user_id) == payload_hash:
+            return
+
+        # Compress larger payloads, the repeated event keys shrink well
+        if len(payload) >= COMPRESS_MIN_SIZE:
+            payload = _COMPRESSED_TAG + zlib.compress(payload)
+
         user_file = self._get_user_file_path(user_id)
-        cipher_suite = cryptography.fernet.Fernet(self.encryption_key)
-        encrypted_data = cipher_suite.encrypt(json.dumps(data).encode())
-        with user_file.open("wb") as file:
+        encrypted_data = self._cipher.encrypt(payload)
+        # Write to a temporary file first so an interrupted write can't corrupt the data
+        temp_file = user_file.with_suffix(".json.tmp")
+        with temp_file.open("wb", buffering=len(encrypted_data) + 4096) as file:
             file.write(encrypted_data)
+            file.flush()
+            os.fsync(file.fileno())  # Make sure the data is on disk before replacing
+        os.replace(temp_file, user_file)
+        self._last_hash[user_id] = payload_hash
+        self._mtimes[user_id] = self._get_mtime(user_file)
+
+    def _queue_dirty(self):
+        """Method to serialize changed user data and queue it for writing"""
+        for user_id, data in self._dirty.items():
+            self._pending_writes[user_id] = _json_dumps(data)
+        self._dirty.clear()
+
+    def _write_pending(self):
+        """Method to write queued user data, taking each user's data as it is written"""
+        with self._write_lock:
+            while self._pending_writes:
+                user_id, payload = self._pending_writes.popitem()
+                try:
+                    self._write_user_data(user_id, payload)
+                except OSError as error:
+                    print(f"Failed to save data for user {user_id}: {error}")
 
-    def get_key(self, user_id: str, key: str, default=None):
+    async def _save_user_data_async(self, user_id: int, data: dict):
+        """Method to schedule a user's data to be saved with other pending saves"""
+        self._cache[user_id] = data
+        self._dirty[user_id] = data
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        """Method to write all pending user data in one batch after a short delay"""
+        try:
+            await asyncio.sleep(SAVE_DELAY)
+            # Keep writing while changes arrive during the previous batch
+            while self._dirty:
+                self._queue_dirty()
+                await asyncio.to_thread(self._write_pending)
+        except asyncio.CancelledError:
+            # Shutdown cancels pending tasks, write everything left before stopping
+            self._queue_dirty()
+            self._write_pending()
+            raise
+        finally:
+            self._flush_task = None
+
+    async def flush(self):
+        """Method to write all pending user data now, whatever state the flush task is in"""
+        self._queue_dirty()
+        self._write_pending()
+
+    async def get_key(self, user_id: int, key: str, default=None):
         """Method to get a key from a user's data"""
-        user_data = self._load_user_data(user_id)
+        user_data = await self._load_user_data(user_id)
         return user_data.get(key, default)
 
-    def set_key(self, user_id: str, key: str, new_value):
+    async def get_many(self, user_id: int, defaults: dict) -> dict:
+        """Method to get several keys, given with their defaults, from one load"""
+        user_data = await self._load_user_data(user_id)
+        return {key: user_data.get(key, default) for key, default in defaults.items()}
+
+    @contextlib.asynccontextmanager
+    async def edit(self, user_id: int):
+        """Method to load a user's data for editing and save it once when done"""
+        user_data = await self._load_user_data(user_id)
+        yield user_data
+        await self._save_user_data_async(user_id, user_data)
+
+    async def set_key(self, user_id: int, key: str, new_value):
         """Method to set a key in a user's data"""
-        user_data = self._load_user_data(user_id)
-        user_data[key] = new_value
-        self._save_user_data(user_id, user_data)
+        async with self.edit(user_id) as user_data:
+            user_data[key] = new_value
 
-    def add_event(self, user_id: str, new_event: dict):
+    async def add_event(self, user_id: int, new_event: dict):
         """Method to add an event to a user's data"""
-        user_data = self._load_user_data(user_id)
-        if "events" not in user_data:
-            user_data["events"] = []
-
-        event_id = len(user_data["events"])
-        new_event["id"] = event_id  # Assign an ID to the new event
-        user_data["events"].append(new_event)
+        async with self.edit(user_id) as user_data:
+            event_id = user_data.get("next_id", 0)
+            new_event["id"] = event_id  # Assign an ID to the new event
+            user_data["next_id"] = event_id + 1
 
-        self._save_user_data(user_id, user_data)
+            # Keep events ordered by timestamp so they can be listed without sorting
+            events = user_data.setdefault("events", {})
+            last_event = next(reversed(events.values()), None)
+            if last_event is None or last_event["timestamp"] <= new_event["timestamp"]:
+                events[str(event_id)] = new_event  # Latest event, append in place
+            else:
+                ordered = list(events.values())
+                bisect.insort(ordered, new_event, key=lambda event: event["timestamp"])
+                user_data["events"] = {str(event["id"]): event for event in ordered}
 
-    def remove_event(self, user_id: str, event_id: int) -> str:
+    async def remove_event(self, user_id: int, event_id: int) -> str:
         """Method to remove an event by its ID"""
-        user_data = self._load_user_data(user_id)
-        if "events" not in user_data or not user_data["events"]:
+        events = await self.get_key(user_id, "events")
+        if not events:
             return "No events found."
+        if str(event_id) not in events:
+            return "Event not found."
 
-        events = user_data["events"]
-        event_index = next(
-            (index for (index, event) in enumerate(events) if event["id"] == event_id),
-            None,
-        )
-
-        if event_index is not None:
-            event_name = events[event_index]["title"]
-            events.pop(event_index)
-            self._save_user_data(user_id, user_data)
-            return f'Event "**{event_name}**" removed.'
-        else:
+        async with self.edit(user_id) as user_data:
+            event = user_data["events"].pop(str(event_id), None)
+        if event is None:
             return "Event not found."
+        return f'Event "**{event["title"]}**" removed.'
 
-    def wipe_events(self, user_id: str) -> str:
+    async def wipe_events(self, user_id: int) -> str:
         """Method to wipe all events for a user"""
-        user_data = self._load_user_data(user_id)
-        if "events" not in user_data or not user_data["events"]:
+        if not await self.get_key(user_id, "events"):
             return "No events found."
 
-        user_data["events"] = []
-        self._save_user_data(user_id, user_data)
+        async with self.edit(user_id) as user_data:
+            user_data["events"] = {}  # Keep next_id so old IDs are never reused
         return "All events have been deleted."
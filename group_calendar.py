@@ -1,18 +1,49 @@
 from lib import *
+from group_timezone import _get_tz
 import views
 
 
 # ------------ HELPER FUNCTIONS ------------
 import datetime
 
+# Local aliases for the datetime names used on every /calendar add
+_datetime = datetime.datetime
+_now = datetime.datetime.now
+_timedelta = datetime.timedelta
+
+# Time formats accepted by parse_hours_minutes: "HH", "HH:MM", "HHam" and "HH:MMam"
+_RE_TIME = re.compile(
+    r"^(?P<hours>[01]?[0-9]|2[0-3])(?::(?P<minutes>[0-5][0-9]))?(?P<indicator>am|pm)?$",
+    re.IGNORECASE,
+)
+
+# Full and abbreviated month names mapped to their number
+_MONTHS = {
+    datetime.date(2000, month_number, 1).strftime(month_format).lower(): month_number
+    for month_number in range(1, 13)
+    for month_format in ("%B", "%b")
+}
+
+# Every prefix of a day name mapped to its number, ambiguous prefixes take the earlier day
+_DAY_PREFIXES = {}
+for _day_number, _day_name in enumerate(
+    ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+):
+    for _length in range(1, len(_day_name) + 1):
+        _DAY_PREFIXES.setdefault(_day_name[:_length], _day_number)
+
 
 def to_int(value: str):
     """Convert the value to an integer if possible."""
-    try:
-        return int(value)
-    except (ValueError, TypeError):
+    if not isinstance(value, str):
         return value
 
+    # Check the digits up front instead of raising on names like "January"
+    digits = value.strip()
+    if digits[:1] in ("+", "-"):
+        digits = digits[1:]
+    return int(value) if digits.isdecimal() else value
+
 
 def get_month_number(month: str):
     """Convert the month string to a number (1 for January, 2 for February, etc.)."""
@@ -21,15 +52,7 @@ def get_month_number(month: str):
     if month is None or isinstance(month, int):
         return month
 
-    try:
-        # Try parsing full month name
-        return int(datetime.datetime.strptime(month, "%B").strftime("%m"))
-    except ValueError:
-        try:
-            # Try parsing abbreviated month name
-            return int(datetime.datetime.strptime(month, "%b").strftime("%m"))
-        except ValueError:
-            return -1
+    return _MONTHS.get(month.lower(), -1)
 
 
 def parse_hours_minutes(time: str):
@@ -37,55 +60,31 @@ def parse_hours_minutes(time: str):
     if not time:
         return None, None
 
-    # Check for am/pm
-    time_indicator = time[-2:].lower()
-
-    # Handle "HH:MMam" and "HH:MMpm" formats
-    if re.match(r"^(?:[01]?[0-9]|2[0-3]):[0-5][0-9](am|pm)$", time):
-        hours, minutes = map(int, time[:-2].split(":"))
-
-    # Handle "HHam" and "HHpm" formats
-    elif re.match(r"^(?:[01]?[0-9]|2[0-3])(am|pm)$", time):
-        hours = int(time[:-2])
-        minutes = 0
-
-    # Handle "HH:MM" format
-    elif re.match(r"^(?:[01]?[0-9]|2[0-3]):[0-5][0-9]$", time):
-        hours, minutes = map(int, time.split(":"))
-
-    # Handle "HH" format
-    elif re.match(r"^(?:[01]?[0-9]|2[0-3])$", time):
-        hours = int(time)
-        minutes = 0
-
-    else:
+    match = _RE_TIME.match(time)
+    if not match:
         return -1, -1
 
-    # Validate time indicator and hours:
-    if hours > 12 and time_indicator in ["am", "pm"]:
-        return -1, -1
+    hours = int(match["hours"])
+    minutes = int(match["minutes"] or 0)
+    time_indicator = match["indicator"]
+
+    if time_indicator:
+        # A 12-hour clock runs from 1 to 12, so "0am" and "13pm" are invalid
+        if not 1 <= hours <= 12:
+            return -1, -1
 
-    # Adjust hours for am/pm
-    if time_indicator == "pm" and hours != 12:
-        hours += 12
-    elif time_indicator == "am" and hours == 12:
-        hours = 0
+        # Adjust hours for am/pm
+        hours = hours % 12 + (12 if time_indicator.lower() == "pm" else 0)
 
     return hours, minutes
 
 
 def get_day_number(day: str):
     """Convert the day string to a number (0 for Monday, 1 for Tuesday, etc.)."""
-    day = day.lower()
-    for day_number, day_name in enumerate(
-        ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-    ):
-        if day_name.startswith(day):
-            return day_number
-    return -1  # Invalid day string
+    return _DAY_PREFIXES.get(day.lower(), -1)  # -1 for an invalid day string
 
 
-def parse_day(user_timezone, year, month, day):
+def parse_day(now, year, month, day):
     """Get the day number from the input day (Monday = Mon = DD)."""
 
     # Check if the day is an integer or None
@@ -99,7 +98,6 @@ def parse_day(user_timezone, year, month, day):
         return -1  # Invalid day string
 
     # Get the current day of the week
-    now = datetime.datetime.now(pytz.timezone(user_timezone))
     current_day_num = now.weekday()
 
     # Calculate the difference to the next occurrence
@@ -108,7 +106,7 @@ def parse_day(user_timezone, year, month, day):
         days_difference = 7  # If the day is today, get the next week's occurrence
 
     # Calculate the next occurrence date
-    next_occurrence = now + datetime.timedelta(days=days_difference)
+    next_occurrence = now + _timedelta(days=days_difference)
 
     # Check if the next occurrence goes past the provided month
     if next_occurrence.month != month or next_occurrence.year != year:
@@ -120,12 +118,13 @@ def parse_day(user_timezone, year, month, day):
 def parse_datetime(user_timezone, year, month, day, time):
     """Parse the date from the given year, month, day, and time."""
 
-    now = datetime.datetime.now()
+    # Read the clock once in the user's timezone and share it with parse_day
+    now = _now(_get_tz(user_timezone))
 
     # Set default values based on conditions
     year = year or now.year
     month = get_month_number(month) or (now.month if year == now.year else 1)
-    day = parse_day(user_timezone, year, month, day) or (
+    day = parse_day(now, year, month, day) or (
         now.day if month == now.month and year == now.year else 1
     )
 
@@ -134,7 +133,7 @@ def parse_datetime(user_timezone, year, month, day, time):
 
     hour, minute = parse_hours_minutes(time)
 
-    if hour == minute == None:
+    if hour is None and minute is None:
         hour, minute = (0, 0)
 
     return year, month, day, hour, minute
@@ -144,10 +143,11 @@ def parse_datetime(user_timezone, year, month, day, time):
 def setup(bot: commands.Bot):
     calendar = bot.create_group(name="calendar", description="Manage your calendar")
 
-    async def send_response(ctx, content=None, embed=None, view=None):
+    async def send_response(ctx, content=None, embed=None, view=None, privacy=None):
         """Send responses based on privacy setting"""
-        user_id = str(ctx.author.id)
-        privacy = bot.user_data_handler.get_key(user_id, "privacy", "private")
+        if privacy is None:
+            user_id = ctx.author.id
+            privacy = await bot.user_data_handler.get_key(user_id, "privacy", "private")
 
         if privacy == "private" and ctx.guild:
             await ctx.author.send(content=content, embed=embed, view=view)
@@ -165,9 +165,17 @@ def setup(bot: commands.Bot):
         time: str = None,
     ):
         """Command to add an event to the calendar"""
+        # Check if all time parameters are None, this needs no deferring to answer
+        if year is None and month is None and day is None and time is None:
+            await ctx.respond(content="At least one time parameter is required.")
+            return
+
         await ctx.defer()
-        user_id = str(ctx.author.id)
-        user_timezone = bot.user_data_handler.get_key(user_id, "timezone")
+        user_id = ctx.author.id
+        user_settings = await bot.user_data_handler.get_many(
+            user_id, {"timezone": None, "privacy": "private"}
+        )
+        user_timezone = user_settings["timezone"]
 
         if not user_timezone:
             await ctx.edit(
@@ -175,18 +183,12 @@ def setup(bot: commands.Bot):
             )
             return
 
-        # Check if all time parameters are None
-        if year == month == day == time == None:
-            await ctx.edit(content="At least one time parameter is required.")
-            return
-
         year, month, day, hour, minute = parse_datetime(
             user_timezone, year, month, day, time
         )
-        local_tz = pytz.timezone(user_timezone)
         try:
-            local_datetime = local_tz.localize(
-                datetime.datetime(year, month, day, hour, minute)
+            local_datetime = _datetime(
+                year, month, day, hour, minute, tzinfo=_get_tz(user_timezone)
             )
         except (ValueError, OverflowError, TypeError) as error:
             print(f"@{ctx.author.name} {error}")
@@ -195,20 +197,22 @@ def setup(bot: commands.Bot):
             )
             return
 
-        utc_time = local_datetime.astimezone(pytz.UTC)
+        # Aware datetimes convert straight to a Unix timestamp, no UTC conversion needed
+        timestamp = int(local_datetime.timestamp())
 
         # Create the new event
         new_event = {
             "title": title,
-            "timestamp": int(utc_time.timestamp()),  # Store time as Unix timestamp
+            "timestamp": timestamp,  # Store time as Unix timestamp
         }
 
         # Call the add_event method from UserDataHandler
-        bot.user_data_handler.add_event(user_id, new_event)
+        await bot.user_data_handler.add_event(user_id, new_event)
 
-        timestamp = int(utc_time.timestamp())
         await send_response(
-            ctx, content=f"**{title}**: <t:{timestamp}:f>, <t:{timestamp}:R>"
+            ctx,
+            content=f"**{title}**: <t:{timestamp}:f>, <t:{timestamp}:R>",
+            privacy=user_settings["privacy"],
         )
 
     @calendar.command(name="list", description="List events")
@@ -216,37 +220,41 @@ def setup(bot: commands.Bot):
         """Command to list events"""
         await ctx.defer()
 
-        user_id = str(member.id) if member else str(ctx.author.id)
+        user_id = member.id if member else ctx.author.id
 
-        # Get privacy setting
-        privacy = bot.user_data_handler.get_key(user_id, "privacy")
+        # Get privacy setting and events together
+        user_data = await bot.user_data_handler.get_many(
+            user_id, {"privacy": None, "events": None}
+        )
+        privacy = user_data["privacy"]
 
         # Check privacy if someone other than the owner is trying to view the list
         if member and privacy == "private" and ctx.author.id != member.id:
             await ctx.edit(content="This user's calendar is private.")
             return
 
-        events = bot.user_data_handler.get_key(user_id, "events")
+        events = user_data["events"]
 
         if not events:
             await ctx.edit(content="No events found.")
             return
-        events.sort(key=lambda x: x["timestamp"])
-
-        # Split the list into chunks of 10
-        event_chunks = [events[i : i + 10] for i in range(0, len(events), 10)]
+        events = list(events.values())  # Already ordered by timestamp
 
-        view = views.EventListView(event_chunks, ctx)
-        await send_response(ctx, embed=view.create_embed(), view=view)
+        view = views.EventListView(events, ctx)
+        # Reuse the privacy setting already loaded when listing your own events
+        own_privacy = (privacy or "private") if user_id == ctx.author.id else None
+        await send_response(
+            ctx, embed=view.page_embed(), view=view, privacy=own_privacy
+        )
 
     @calendar.command(name="remove", description="Remove an event by its ID")
     async def removeevent(ctx: commands.Context, event_id: int):
         """Command to remove an event by its ID"""
         await ctx.defer()
-        user_id = str(ctx.author.id)
+        user_id = ctx.author.id
 
         # Call the remove_event method from UserDataHandler
-        result_message = bot.user_data_handler.remove_event(user_id, event_id)
+        result_message = await bot.user_data_handler.remove_event(user_id, event_id)
 
         await send_response(ctx, content=result_message)
 
@@ -254,7 +262,7 @@ def setup(bot: commands.Bot):
     async def wipe(ctx: commands.Context):
         """Command to delete all events"""
         await ctx.defer()
-        user_id = str(ctx.author.id)
+        user_id = ctx.author.id
 
         confirm_response = views.Confirm(user_id=ctx.author.id, timeout=15)
         await ctx.edit(
@@ -265,7 +273,7 @@ def setup(bot: commands.Bot):
         if confirm_response.value is None:
             await ctx.send(content="You didn't respond in time, please try again.")
         elif confirm_response.value:
-            result_message = bot.user_data_handler.wipe_events(user_id)
+            result_message = await bot.user_data_handler.wipe_events(user_id)
             await ctx.send(content=result_message)
         else:
             await ctx.send(content="Operation cancelled.")
@@ -4,11 +4,9 @@ from lib import *
 def setup(bot: commands.Bot):
     help = bot.create_group(name="help")
 
-    @help.command(name="commands", description="Get a list of all commands")
-    async def commands_list(ctx: commands.Context):
-        """Returns a list of all the available commands to the user"""
-        await ctx.defer()
-
+    @functools.cache
+    def build_help_text():
+        """Build the command list once, commands don't change after loading"""
         # Retrieve all commands
         all_commands = bot.application_commands
 
@@ -25,6 +23,13 @@ def setup(bot: commands.Bot):
                     )
             else:
                 help_text += f" - `/{cmd.name}`: {cmd.description}\n"
+        return help_text
+
+    @help.command(name="commands", description="Get a list of all commands")
+    async def commands_list(ctx: commands.Context):
+        """Returns a list of all the available commands to the user"""
+        await ctx.defer()
+        help_text = build_help_text()
 
         # Send the list to the user via DM
         if ctx.guild:
@@ -18,9 +18,9 @@ def setup(bot: commands.Bot):
     ):
         """Adjust privacy settings for user data"""
         await ctx.defer()
-        user_id = str(ctx.author.id)
+        user_id = ctx.author.id
 
-        bot.user_data_handler.set_key(user_id, key="privacy", new_value=privacy)
+        await bot.user_data_handler.set_key(user_id, key="privacy", new_value=privacy)
 
         await ctx.edit(content=f"Your privacy setting has been set to {privacy}.")
 
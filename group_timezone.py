@@ -2,44 +2,108 @@ from lib import *
 import views
 
 
+# ------------ HELPER FUNCTIONS ------------
+# Seconds before the timezone list is rebuilt to pick up DST changes
+TIMEZONE_LIST_TTL = 1800
+
+_timezone_list_cache = (None, [])  # (monotonic build time, timezone list)
+
+# All valid timezone names, without entries that aren't real zones
+ALL_TIMEZONES = frozenset(zoneinfo.available_timezones() - {"Factory", "localtime"})
+_SORTED_TIMEZONES = tuple(sorted(ALL_TIMEZONES))
+# Lowercased names, built once so autocomplete doesn't lowercase every name per keystroke
+_TIMEZONES_LOWER = tuple((tz, tz.lower()) for tz in _SORTED_TIMEZONES)
+
+# Discord shows at most 25 autocomplete suggestions
+AUTOCOMPLETE_LIMIT = 25
+
+
+@functools.lru_cache(maxsize=1024)
+def _get_tz(name: str):
+    """Get the tzinfo object for a timezone name, cached per name."""
+    return zoneinfo.ZoneInfo(name)
+
+
+def _format_offset(offset: int):
+    """Format a UTC offset in seconds like strftime's %z, e.g. +0530."""
+    sign = "-" if offset < 0 else "+"
+    hours, minutes = divmod(abs(offset) // 60, 60)
+    return f"{sign}{hours:02}{minutes:02}"
+
+
+def _build_timezone_list():
+    """Build a list of all timezones with their current UTC offset, sorted by offset."""
+    now_utc = datetime.datetime.now(datetime.timezone.utc)
+    timezone_list = []
+    for tz in _SORTED_TIMEZONES:
+        offset = now_utc.astimezone(_get_tz(tz)).utcoffset()
+        timezone_list.append((tz, int(offset.total_seconds())))
+    # Names are already in order, so a stable sort on the offset alone keeps them sorted
+    timezone_list.sort(key=lambda item: item[1])
+    return [(tz, _format_offset(offset)) for tz, offset in timezone_list]
+
+
+def get_timezone_list():
+    """Get the sorted timezone list, rebuilding it once it is older than the TTL."""
+    global _timezone_list_cache
+    built_at, timezone_list = _timezone_list_cache
+    if built_at is None or time.monotonic() - built_at > TIMEZONE_LIST_TTL:
+        timezone_list = _build_timezone_list()
+        _timezone_list_cache = (time.monotonic(), timezone_list)
+    return timezone_list
+
+
+async def timezone_autocomplete(ctx: discord.AutocompleteContext):
+    """Suggest timezones containing the text typed so far, in alphabetical order."""
+    current = (ctx.value or "").lower()
+    if not current:
+        return list(_SORTED_TIMEZONES[:AUTOCOMPLETE_LIMIT])
+
+    matches = []
+    for tz, tz_lower in _TIMEZONES_LOWER:
+        if current in tz_lower:
+            matches.append(tz)
+            if len(matches) == AUTOCOMPLETE_LIMIT:
+                break
+    return matches
+
+
 # ------------ TIMEZONES GROUP COMMANDS ------------
 def setup(bot: commands.Bot):
     timezone = bot.create_group(name="timezone", description="Manage your timezone")
 
     @timezone.command(name="set", description="Set your timezone")
-    async def set_timezone(ctx: commands.Context, timezone_name: str):
+    async def set_timezone(
+        ctx: commands.Context,
+        timezone_name: discord.commands.Option(
+            str,
+            "Your timezone, e.g. America/New_York",
+            autocomplete=timezone_autocomplete,
+        ),
+    ):
         """Command to set user's timezone"""
         await ctx.defer()
-        if timezone_name not in pytz.all_timezones_set:
+        if timezone_name not in ALL_TIMEZONES:
             await ctx.edit(
                 content="Invalid timezone. Please use `/timezone list` to see available timezones."
             )
             return
 
-        user_id = str(ctx.author.id)
-        bot.user_data_handler.set_key(user_id, key="timezone", new_value=timezone_name)
+        user_id = ctx.author.id
+        await bot.user_data_handler.set_key(
+            user_id, key="timezone", new_value=timezone_name
+        )
         await ctx.edit(content=f"Your timezone has been set to {timezone_name}.")
 
     @timezone.command(name="list", description="List all available timezones")
     async def list_timezones(ctx: commands.Context):
         """Command to list all available timezones"""
         await ctx.defer()
-        # Create a list of all timezones with their current UTC offset
-        timezone_list = [
-            (tz, datetime.datetime.now(pytz.timezone(tz)).strftime("%z"))
-            for tz in pytz.all_timezones_set
-        ]
-        # Convert the UTC offset to minutes and sort the list by the offset
-        timezone_list.sort(
-            key=lambda x: int(x[1][:3]) * 60 + int(x[1][3:5])
-            if x[1][0] == "+"
-            else -int(x[1][1:3]) * 60 - int(x[1][3:5])
-        )
-        # Split the list into chunks of 10
-        timezone_chunks = [
-            timezone_list[i : i + 10] for i in range(0, len(timezone_list), 10)
-        ]
-        view = views.TimezoneView(timezone_chunks, ctx)
-        await ctx.edit(embed=view.create_embed(), view=view)
+        timezone_list = get_timezone_list()
+        view = views.TimezoneView(timezone_list, ctx)
+        await ctx.edit(embed=view.page_embed(), view=view)
+
+    # Resolve every timezone and build the list now rather than on the first /timezone list
+    get_timezone_list()
 
     print("Timezone group loaded")
@@ -3,13 +3,28 @@ import discord
 from discord.ext import commands
 
 # PYTHON LIBRARIES
+import asyncio
+import bisect
+import collections
+import contextlib
 import datetime
+import functools
+import hashlib
 import os
 import json
 import pathlib
 import re
+import threading
+import time
+import zoneinfo
+import zlib
 
 # INSTALLED LIBRARIES
-import pytz
 import dotenv
 import cryptography.fernet
+
+# OPTIONAL LIBRARIES
+try:
+    import orjson
+except ImportError:
+    orjson = None
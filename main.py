@@ -2,16 +2,39 @@
 from lib import *
 import datahandler
 
+
 # ------------ ENVIRONMENT VARIABLES ------------
+def load_env_vars(var_list: list):
+    """Get the values of the given environment variables, failing if any are missing"""
+    missing = [var for var in var_list if not os.environ.get(var)]
+    if missing:
+        raise EnvironmentError(f"Missing environment variables: {', '.join(missing)}")
+    return [os.environ[var] for var in var_list]
+
+
 # Load environment variables from .env file
 dotenv.load_dotenv()
 
-# Load encryption key and Discord token from environment variables
-TOKEN = os.getenv("DISCORD_TOKEN")
+# Check the encryption key and load the Discord token from environment variables
+_, TOKEN = load_env_vars(["ENCRYPTION_KEY", "DISCORD_TOKEN"])
+
+# Optional guild to register commands in while developing, where they update instantly
+DEBUG_GUILD_ID = os.getenv("DEBUG_GUILD_ID")
+
 
 # ------------ BOT VARIABLES ------------
+class CalendarBot(commands.Bot):
+    """Bot that writes any pending user data before closing"""
+
+    async def close(self):
+        await self.user_data_handler.flush()
+        await super().close()
+
+
 intents = discord.Intents.default()
-bot = commands.Bot(intents=intents)
+bot = CalendarBot(
+    intents=intents, debug_guilds=[int(DEBUG_GUILD_ID)] if DEBUG_GUILD_ID else None
+)
 bot.user_data_handler = datahandler.UserDataHandler()
 
 
@@ -1,14 +1,33 @@
 from lib import *
 
+# Number of rendered page embeds each view keeps for revisiting pages
+EMBED_CACHE_SIZE = 8
+
+# Longest event title shown, keeps a full page under Discord's 4096 character description limit
+MAX_TITLE_LENGTH = 256
+
 
 class PaginatedView(discord.ui.View):
     """Base class for paginated views"""
 
-    def __init__(self, items, ctx):
+    def __init__(self, items, ctx, page_size: int = 10):
         super().__init__(timeout=None)
         self.items = items  # Items to be displayed in the view
         self.ctx = ctx  # Context of the command
+        self.page_size = page_size  # Number of items per page
         self.page = 0  # Current page index
+        self._embed_cache = collections.OrderedDict()  # Rendered embeds by page index
+
+    @property
+    def page_count(self):
+        """Number of pages needed to display all items"""
+        return max(1, (len(self.items) + self.page_size - 1) // self.page_size)
+
+    @property
+    def current_items(self):
+        """Items on the current page, sliced only when needed"""
+        start = self.page * self.page_size
+        return self.items[start : start + self.page_size]
 
     @discord.ui.button(label="Previous", style=discord.ButtonStyle.primary)
     async def previous_button(
@@ -19,8 +38,8 @@ class PaginatedView(discord.ui.View):
         if self.page > 0:
             self.page -= 1
         else:
-            self.page = len(self.items) - 1
-        await interaction.response.edit_message(embed=self.create_embed())
+            self.page = self.page_count - 1
+        await interaction.response.edit_message(embed=self.page_embed())
 
     @discord.ui.button(label="Next", style=discord.ButtonStyle.primary)
     async def next_button(
@@ -28,11 +47,24 @@ class PaginatedView(discord.ui.View):
     ):
         """Button to go to the next page"""
         # Increment page index or wrap around if at the end
-        if self.page < len(self.items) - 1:
+        if self.page < self.page_count - 1:
             self.page += 1
         else:
             self.page = 0
-        await interaction.response.edit_message(embed=self.create_embed())
+        await interaction.response.edit_message(embed=self.page_embed())
+
+    def page_embed(self):
+        """Method to get the current page's embed, reusing it if it was rendered recently"""
+        embed = self._embed_cache.get(self.page)
+        if embed is not None:
+            self._embed_cache.move_to_end(self.page)
+            return embed
+
+        embed = self.create_embed()
+        self._embed_cache[self.page] = embed
+        if len(self._embed_cache) > EMBED_CACHE_SIZE:
+            self._embed_cache.popitem(last=False)  # Drop the least recently shown page
+        return embed
 
     def create_embed(self):
         """Method to create an embed for the current page, must be implemented by subclasses"""
@@ -46,9 +78,9 @@ class TimezoneView(PaginatedView):
         embed = discord.Embed(
             title="Available Timezones", colour=discord.Colour.green()
         )
-        embed.set_footer(text=f"Page {self.page+1}/{len(self.items)}")
+        embed.set_footer(text=f"Page {self.page+1}/{self.page_count}")
         # Add each timezone and its UTC offset as a field
-        for timezone, offset in self.items[self.page]:
+        for timezone, offset in self.current_items:
             embed.add_field(name=timezone, value=f"`UTC {offset}`", inline=False)
         return embed
 
@@ -58,23 +90,25 @@ class EventListView(PaginatedView):
 
     def create_embed(self):
         embed = discord.Embed(title="Your Events", colour=discord.Colour.green())
-        embed.set_footer(text=f"Page {self.page+1}/{len(self.items)}")
-        # Add each event with its ID, name, and time as a field
-        for event in self.items[self.page]:
-            event_time = datetime.datetime.fromtimestamp(event["timestamp"])
-            timestamp = int(event_time.timestamp())
-            embed.add_field(
-                name=f"`{event['id']}` - **{event['title']}**",
-                value=f"<t:{timestamp}:f>, <t:{timestamp}:R>",
-                inline=False,
+        embed.set_footer(text=f"Page {self.page+1}/{self.page_count}")
+        # List each event with its ID, name, and time in a single description
+        lines = []
+        for event in self.current_items:
+            title = event["title"]
+            if len(title) > MAX_TITLE_LENGTH:
+                title = title[: MAX_TITLE_LENGTH - 1] + "…"
+            timestamp = event["timestamp"]  # Stored as an int Unix timestamp already
+            lines.append(
+                f"`{event['id']}` - **{title}**\n<t:{timestamp}:f>, <t:{timestamp}:R>"
             )
+        embed.description = "\n\n".join(lines)
         return embed
 
 
 class Confirm(discord.ui.View):
     """View for confirming an action"""
 
-    def __init__(self, user_id: str, timeout: int = 60):
+    def __init__(self, user_id: int, timeout: int = 60):
         super().__init__(timeout=timeout)
         self.user_id = user_id  # ID of the user who initiated the command
 